@@ -0,0 +1,10 @@
+import multiprocessing
+import os
+
+# Render provides PORT; 10000 matches the local app.run() default.
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
+
+# gevent: blocking Supabase calls yield, so each worker multiplexes many requests.
+worker_class = "gevent"
+workers = int(os.getenv("WEB_CONCURRENCY") or multiprocessing.cpu_count() * 2 + 1)
+worker_connections = int(os.getenv("WORKER_CONNECTIONS") or 1000)
@@ -1,14 +1,41 @@
 import os
 import time
+import atexit
+import functools
+import hashlib
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import base64
-import json
 import re
 from datetime import datetime, timezone
-from flask import Flask, request, jsonify
+from types import MappingProxyType
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+import gevent
+import jwt
+import orjson
+from flask import Flask, request, jsonify, make_response
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-from supabase import create_client, Client
+from werkzeug.exceptions import HTTPException
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """jsonify() and request.get_json() through orjson (keys stay sorted, like Flask's default)."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
 CORS(
     app,
@@ -19,42 +46,159 @@ CORS(
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
+# Optional: lets HS256 user tokens be verified without calling Supabase Auth.
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
 
 if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
     raise RuntimeError("Missing SUPABASE_URL or SUPABASE_SERVICE_KEY in Render env vars.")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
 
-ALLOWED_DIFFICULTIES = {"beginner", "intermediate", "advanced"}
-ALLOWED_PACES = {"Slow", "Normal", "Fast"}
+# Per-process HTTP pools for Supabase (PostgREST + Auth)
+SUPABASE_MAX_CONNECTIONS = 200
+SUPABASE_MAX_KEEPALIVE_CONNECTIONS = 100
+SUPABASE_KEEPALIVE_EXPIRY_SECONDS = 60.0
+
+# postgrest's Prefer: return=minimal (ReturnMethod.minimal), kept as a plain string
+# so postgrest itself is not imported until the first Supabase call.
+RETURN_MINIMAL = "minimal"
+
+
+@functools.lru_cache(maxsize=1)
+def get_supabase() -> "Client":
+    # Built lazily, once per process (i.e. after the server forks its workers).
+    # supabase/postgrest/httpx are imported here to keep cold start cheap.
+    import httpx
+    from gotrue.http_clients import SyncClient as GoTrueSession
+    from postgrest.utils import SyncClient as PostgrestSession
+    from supabase import create_client
+
+    client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+
+    # Swap the default sessions for keep-alive HTTP/2 pools sized for a gevent worker,
+    # so back-to-back queries reuse warm TLS connections instead of handshaking again.
+    limits = httpx.Limits(
+        max_connections=SUPABASE_MAX_CONNECTIONS,
+        max_keepalive_connections=SUPABASE_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY_SECONDS,
+    )
+
+    default_session = client.postgrest.session
+    client.postgrest.session = PostgrestSession(
+        base_url=default_session.base_url,
+        headers=default_session.headers,
+        timeout=default_session.timeout,
+        http2=True,
+        limits=limits,
+    )
+    default_session.close()
+
+    # Token verification (auth.get_user) goes through GoTrue's own client.
+    if hasattr(client.auth, "_http_client"):
+        default_auth_session = client.auth._http_client
+        auth_session = GoTrueSession(http2=True, limits=limits)
+        client.auth._http_client = auth_session
+        # auth.admin was built around the same default client; keep it on a live one.
+        admin = getattr(client.auth, "admin", None)
+        if getattr(admin, "_http_client", None) is default_auth_session:
+            admin._http_client = auth_session
+        default_auth_session.close()
+
+    return client
+
+
+ALLOWED_DIFFICULTIES = frozenset({"beginner", "intermediate", "advanced"})
+ALLOWED_LENGTHS = frozenset({20, 30, 45, 60})
+ALLOWED_PACES = frozenset({"Slow", "Normal", "Fast"})
+MUSIC_OFF_VALUES = frozenset({"none", "no", "off", "coach only", "coach-only"})
+FOLLOWER_VISIBILITIES = frozenset({"friends", "friends_only", "followers", "followers_only"})
 
 # Demo rules (your spec)
 DEMO_DIFFICULTY = "intermediate"   # locked
 DEMO_LENGTH_MIN = 20              # locked
 DEMO_MUSIC = "demo"               # locked (we'll add audio later; for now it's just a label)
 DEMO_PACE = "Normal"              # keep simple + consistent
+DEMO_PLAN = {                     # built once; treat as read-only
+    "difficulty": DEMO_DIFFICULTY,
+    "length_min": DEMO_LENGTH_MIN,
+    "pace": DEMO_PACE,
+    "music": DEMO_MUSIC,
+}
 GUEST_GENERATE_COOLDOWN_SECONDS = 15
 _guest_last_generate_by_ip = {}
 
+# In-process TTL caches (ttl_cache_set) drop expired entries at most this often
+TTL_CACHE_SWEEP_SECONDS = 30
+_ttl_cache_swept_at = {}
+
+# Verified bearer tokens: sha256(token) -> (user_id or "" if rejected, expires_at)
+AUTH_CACHE_MAX_SECONDS = 300
+AUTH_NEGATIVE_CACHE_SECONDS = 30
+AUTH_CACHE_MAX_ENTRIES = 10_000
+_verified_user_by_token = {}
+_verified_user_lock = threading.Lock()
+
+# profiles.plan_tier for pro users: user_id -> (tier, expires_at)
+PLAN_TIER_CACHE_SECONDS = 60
+PLAN_TIER_CACHE_MAX_ENTRIES = 50_000
+_plan_tier_by_user = {}
+_plan_tier_lock = threading.Lock()
+
+# Pool for follow-up writes the response doesn't wait on.
+# Lookups fanned out inside a request use run_concurrently instead, so they never queue behind these.
+EXECUTOR = ThreadPoolExecutor(max_workers=16)
+
+# Upper bound on sub-requests resolved by one POST /batch
+BATCH_MAX_PATHS = 10
+
+# Notification rows are coalesced in the background (see enqueue_notification)
+NOTIFICATION_BATCH_MAX_ROWS = 256
+NOTIFICATION_FLUSH_SECONDS = 0.015
+NOTIFICATION_QUEUE_MAX_ROWS = 10_000
+# Earlier schemas named the unread flag differently; the first insert picks the one this table has
+NOTIFICATION_READ_FLAGS = ({"read": False}, {"is_read": False}, {})
+NOTIFICATION_MISSING_COLUMN_CODES = frozenset({"PGRST204", "42703"})
+_notification_read_flag = None
+_notification_queue = queue.Queue(maxsize=NOTIFICATION_QUEUE_MAX_ROWS)
+_notification_worker = None
+_notification_worker_lock = threading.Lock()
+
+# Post counter refreshes in flight / requested again while in flight (see schedule_post_counts)
+_post_counts_running = set()
+_post_counts_pending = set()
+_post_counts_lock = threading.Lock()
+
+# Hot-path row shapes, built once per process
+PROFILE_ROW_COLUMNS = "id,username,display_name,bio,avatar_url,account_privacy,plan_tier,subscription_status,tier_updated_at,created_at,updated_at"
+LISTEN_SESSION_COLUMNS = "id,job_id,user_id,is_public,class_mode,status,difficulty,length_min,pace,music,listen_required_seconds,listen_progress_seconds,listened_complete,listened_complete_at,storage_path"
+NEW_PROFILE_ROW_TEMPLATE = MappingProxyType({
+    "username": None,
+    "display_name": None,
+    "bio": "",
+    "avatar_url": "assets/avatars/default-avatar-head.png",
+    "account_privacy": "public",
+    "plan_tier": "free",
+})
+SESSION_POST_ROW_DEFAULTS = MappingProxyType({
+    "likes_count": 0,
+    "comments_count": 0,
+})
+
 
 def normalize_plan(payload: dict):
     difficulty = (payload.get("difficulty") or "beginner").strip().lower()
-    if difficulty not in ALLOWED_DIFFICULTIES:
-        difficulty = "beginner"
+    difficulty = difficulty if difficulty in ALLOWED_DIFFICULTIES else "beginner"
 
     try:
         length_min = int(payload.get("length") or payload.get("length_min") or 30)
     except Exception:
         length_min = 30
-    if length_min not in (20, 30, 45, 60):
-        length_min = 30
+    length_min = length_min if length_min in ALLOWED_LENGTHS else 30
 
     pace = str(payload.get("pace") or "Normal").strip()
-    if pace not in ALLOWED_PACES:
-        pace = "Normal"
+    pace = pace if pace in ALLOWED_PACES else "Normal"
 
     music = str(payload.get("music") or "none").strip()
-    if music.lower() in ("none", "no", "off", "coach only", "coach-only"):
+    if music.lower() in MUSIC_OFF_VALUES:
         music = "none"
 
     return {
@@ -65,12 +209,86 @@ def normalize_plan(payload: dict):
     }
 
 
+def invalid_plan_field(payload: dict):
+    """
+    Name of the first plan field the caller explicitly sent with a value
+    normalize_plan would throw away, or None if the plan is usable.
+    """
+    difficulty = payload.get("difficulty")
+    if difficulty and str(difficulty).strip().lower() not in ALLOWED_DIFFICULTIES:
+        return "difficulty"
+
+    length = payload.get("length") or payload.get("length_min")
+    if length:
+        try:
+            if int(length) not in ALLOWED_LENGTHS:
+                return "length"
+        except Exception:
+            return "length"
+
+    pace = payload.get("pace")
+    if pace and str(pace).strip() not in ALLOWED_PACES:
+        return "pace"
+
+    return None
+
+
 def supa_err(resp):
-    err = getattr(resp, "error", None)
+    try:
+        err = resp.error
+    except AttributeError:
+        return None
     if not err:
         return None
-    msg = getattr(err, "message", None) or getattr(err, "msg", None)
-    return msg or str(err)
+    return getattr(err, "message", None) or getattr(err, "msg", None) or str(err)
+
+def run_concurrently(*calls):
+    """
+    Run (fn, *args) calls on greenlets owned by the current request and return their
+    results in order. Under the gevent workers the Supabase calls overlap; nothing is
+    shared with other requests, so a large fan-out can't stall anyone else's lookups.
+    """
+    greenlets = [gevent.spawn(fn, *args) for fn, *args in calls]
+    try:
+        gevent.joinall(greenlets, raise_error=True)
+    except BaseException:
+        # One call failed (or this request was killed): stop the siblings' Supabase calls too.
+        gevent.killall(greenlets)
+        raise
+    return [g.value for g in greenlets]
+
+def ttl_cache_get(cache: dict, lock, key, default=None):
+    """Value stored under key if it has not expired, else default."""
+    with lock:
+        entry = cache.get(key)
+    if entry and entry[1] > time.time():
+        return entry[0]
+    return default
+
+
+def ttl_cache_set(cache: dict, lock, key, value, ttl: float, max_entries: int):
+    """
+    Store value for ttl seconds. When full, evict the oldest insert (O(1));
+    expired entries are swept at most every TTL_CACHE_SWEEP_SECONDS, not on every insert.
+    """
+    if ttl <= 0:
+        return
+
+    now = time.time()
+    with lock:
+        # Re-insert at the end so dict order stays oldest-first.
+        cache.pop(key, None)
+
+        if now - _ttl_cache_swept_at.get(id(cache), 0) >= TTL_CACHE_SWEEP_SECONDS:
+            _ttl_cache_swept_at[id(cache)] = now
+            for stale_key in [k for k, (_, expires_at) in cache.items() if expires_at <= now]:
+                del cache[stale_key]
+
+        while len(cache) >= max_entries:
+            del cache[next(iter(cache))]
+
+        cache[key] = (value, now + ttl)
+
 
 def utc_now_iso():
     return datetime.now(timezone.utc).isoformat()
@@ -103,8 +321,8 @@ def ensure_profile_row(user_id: str):
         return None
 
     res = (
-        supabase.table("profiles")
-        .select("id,username,display_name,bio,avatar_url,account_privacy,plan_tier,subscription_status,tier_updated_at,created_at,updated_at")
+        get_supabase().table("profiles")
+        .select(PROFILE_ROW_COLUMNS)
         .eq("id", user_id)
         .limit(1)
         .execute()
@@ -113,26 +331,17 @@ def ensure_profile_row(user_id: str):
     if res.data:
         return res.data[0]
 
-    payload = {
-        "id": user_id,
-        "username": None,
-        "display_name": None,
-        "bio": "",
-        "avatar_url": "assets/avatars/default-avatar-head.png",
-        "account_privacy": "public",
-        "plan_tier": "free",
-        "created_at": utc_now_iso(),
-        "updated_at": utc_now_iso(),
-    }
+    now_iso = utc_now_iso()
+    payload = {**NEW_PROFILE_ROW_TEMPLATE, "id": user_id, "created_at": now_iso, "updated_at": now_iso}
 
-    insert_res = supabase.table("profiles").insert(payload).execute()
+    insert_res = get_supabase().table("profiles").insert(payload).execute()
     if insert_res.data:
         return insert_res.data[0]
 
     # Race-condition fallback: if another request created it first, read again.
     retry = (
-        supabase.table("profiles")
-        .select("id,username,display_name,bio,avatar_url,account_privacy,plan_tier,subscription_status,tier_updated_at,created_at,updated_at")
+        get_supabase().table("profiles")
+        .select(PROFILE_ROW_COLUMNS)
         .eq("id", user_id)
         .limit(1)
         .execute()
@@ -140,24 +349,35 @@ def ensure_profile_row(user_id: str):
     return retry.data[0] if retry.data else None
 
 
-def jwt_claims_no_verify(jwt: str):
+def jwt_claims_no_verify(token: str):
     # only used for debug-ish reads; not for auth decisions
     try:
-        parts = jwt.split(".")
+        parts = token.split(".")
         if len(parts) < 2:
             return {}
         payload_b64 = parts[1] + "=" * (-len(parts[1]) % 4)
-        payload = base64.urlsafe_b64decode(payload_b64.encode("utf-8")).decode("utf-8")
-        return json.loads(payload)
+        claims = orjson.loads(base64.urlsafe_b64decode(payload_b64.encode("utf-8")))
+        return claims if isinstance(claims, dict) else {}
     except Exception:
         return {}
 
 
+# Returned by get_json_body(invalid=INVALID_JSON) so callers can tell a bad body from a JSON null
+INVALID_JSON = object()
+
+
+def get_json_body(invalid=None):
+    """Raw request body parsed with orjson (empty body -> {}); `invalid` if it isn't valid JSON."""
+    try:
+        return orjson.loads(request.get_data(cache=False) or b"{}")
+    except orjson.JSONDecodeError:
+        return invalid
+
 def get_bearer_token():
-    auth = request.headers.get("Authorization") or ""
-    if not auth.lower().startswith("bearer "):
+    auth = request.headers.get("Authorization")
+    if not auth or auth[:7].lower() != "bearer ":
         return None
-    token = auth.split(" ", 1)[1].strip()
+    token = auth[7:].strip()
     return token or None
 
 def get_client_ip():
@@ -170,17 +390,29 @@ def get_plan_tier(user_id: str):
     """
     Read profiles.plan_tier for the user.
     Defaults to 'free' if missing.
+    Only 'pro' is cached (PLAN_TIER_CACHE_SECONDS): an upgrade shows up on the next request,
+    while a downgrade may lag by up to the TTL, which is harmless.
     """
     if not user_id:
         return "free"
+
+    cached = ttl_cache_get(_plan_tier_by_user, _plan_tier_lock, user_id)
+    if cached:
+        return cached
+
     try:
-        res = supabase.table("profiles").select("plan_tier").eq("id", user_id).limit(1).execute()
+        res = get_supabase().table("profiles").select("plan_tier").eq("id", user_id).limit(1).execute()
         if res.data and isinstance(res.data[0], dict):
-            return (res.data[0].get("plan_tier") or "free").strip().lower()
-        return "free"
+            tier = (res.data[0].get("plan_tier") or "free").strip().lower()
+        else:
+            tier = "free"
     except Exception:
         return "free"
 
+    if tier == "pro":
+        ttl_cache_set(_plan_tier_by_user, _plan_tier_lock, user_id, tier, PLAN_TIER_CACHE_SECONDS, PLAN_TIER_CACHE_MAX_ENTRIES)
+    return tier
+
 def get_active_job_for_user(user_id: str):
     """
     Returns one active job id for this signed-in user, or None.
@@ -194,7 +426,7 @@ def get_active_job_for_user(user_id: str):
 
     try:
         res = (
-            supabase.table("class_sessions")
+            get_supabase().table("class_sessions")
             .select("job_id,status")
             .eq("user_id", user_id)
             .in_("status", ["queued", "pending", "processing"])
@@ -209,52 +441,227 @@ def get_active_job_for_user(user_id: str):
     except Exception:
         return None
 
+def fetch_token_user_id(token: str) -> str | None:
+    """
+    Verify token with Supabase Auth (one network round-trip) and return user id.
+    Returns None for a rejected token; transport errors propagate.
+    """
+    user_res = get_supabase().auth.get_user(token)
+
+    user_obj = getattr(user_res, "user", None)
+    if not user_obj and hasattr(user_res, "data"):
+        user_obj = getattr(user_res.data, "user", None)
+
+    if user_obj and getattr(user_obj, "id", None):
+        return user_obj.id
+
+    if isinstance(user_res, dict):
+        u = user_res.get("user")
+        if isinstance(u, dict):
+            return u.get("id")
+
+    return None
+
+
+@functools.lru_cache(maxsize=1)
+def get_jwks_client():
+    # Signing keys are fetched on first use and cached by PyJWKClient.
+    return jwt.PyJWKClient(f"{SUPABASE_URL}/auth/v1/.well-known/jwks.json")
+
+
+def verify_token_locally(token: str) -> str | None:
+    """
+    Check a Supabase access token's signature, exp and audience without a network call.
+    Returns the user id, "" if the token is invalid, or None if it can't be checked
+    locally (HS256 without SUPABASE_JWT_SECRET, unknown key or algorithm).
+    """
+    try:
+        alg = jwt.get_unverified_header(token).get("alg")
+    except jwt.InvalidTokenError:
+        return ""
+
+    if alg == "HS256":
+        if not SUPABASE_JWT_SECRET:
+            return None
+        signing_key = SUPABASE_JWT_SECRET
+    elif alg in ("RS256", "ES256"):
+        try:
+            signing_key = get_jwks_client().get_signing_key_from_jwt(token).key
+        except jwt.PyJWKClientError:
+            return None
+    else:
+        return None
+
+    try:
+        claims = jwt.decode(token, signing_key, algorithms=[alg], audience="authenticated")
+    except jwt.InvalidTokenError:
+        return ""
+
+    return str(claims.get("sub") or "")
+
+
 def get_verified_user_id_from_request() -> str | None:
     """
-    Verify token with Supabase Auth and return user id.
+    Verify token (locally when possible, else with Supabase Auth) and return user id.
     If it fails, return None.
+    Results are cached per token (never past the token's exp); rejections
+    are cached briefly so a flood of bad tokens doesn't reach Supabase.
     """
     token = get_bearer_token()
     if not token:
         return None
 
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    now = time.time()
+
+    # Rejections are cached as "" so they are distinguishable from a miss.
+    cached = ttl_cache_get(_verified_user_by_token, _verified_user_lock, key)
+    if cached is not None:
+        return cached or None
+
     try:
-        user_res = supabase.auth.get_user(token)
+        user_id = verify_token_locally(token)
+        if user_id is None:
+            user_id = fetch_token_user_id(token)
+    except Exception:
+        return None
 
-        user_obj = getattr(user_res, "user", None)
-        if not user_obj and hasattr(user_res, "data"):
-            user_obj = getattr(user_res.data, "user", None)
+    if user_id:
+        exp = safe_int(jwt_claims_no_verify(token).get("exp"), 0)
+        ttl = min(AUTH_CACHE_MAX_SECONDS, exp - now)
+    else:
+        ttl = AUTH_NEGATIVE_CACHE_SECONDS
 
-        if user_obj and getattr(user_obj, "id", None):
-            return user_obj.id
+    ttl_cache_set(_verified_user_by_token, _verified_user_lock, key, user_id or "", ttl, AUTH_CACHE_MAX_ENTRIES)
 
-        if isinstance(user_res, dict):
-            u = user_res.get("user")
-            if isinstance(u, dict):
-                return u.get("id")
+    return user_id or None
 
-        return None
-    except Exception:
-        return None
+
+def static_etag(body) -> str:
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return hashlib.blake2b(body, digest_size=8).hexdigest()
+
+
+def cacheable(resp, etag: str, max_age: int = 60):
+    """Tag a response whose body never changes for this process; answers If-None-Match with 304."""
+    resp.set_etag(etag)
+    resp.cache_control.public = True
+    resp.cache_control.max_age = max_age
+    return resp.make_conditional(request)
+
+
+# Health/debug endpoints are probed constantly and their bodies are fixed per process.
+HOME_TEXT = "Corner API OK"
+HOME_ETAG = static_etag(HOME_TEXT)
+
+_service_key_claims = jwt_claims_no_verify(SUPABASE_SERVICE_KEY)
+WHOAMI_PAYLOAD = {
+    "supabase_url_set": bool(SUPABASE_URL),
+    "key_claims": {
+        "role": _service_key_claims.get("role"),
+        "ref": _service_key_claims.get("ref"),
+        "iat": _service_key_claims.get("iat"),
+        "exp": _service_key_claims.get("exp"),
+    }
+}
+WHOAMI_ETAG = static_etag(orjson.dumps(WHOAMI_PAYLOAD, option=orjson.OPT_SORT_KEYS))
 
 
 @app.route("/")
 def home():
-    return "Corner API OK"
+    return cacheable(make_response(HOME_TEXT), HOME_ETAG)
 
 
 @app.route("/_whoami")
 def whoami():
-    claims = jwt_claims_no_verify(SUPABASE_SERVICE_KEY)
-    return jsonify({
-        "supabase_url_set": bool(SUPABASE_URL),
-        "key_claims": {
-            "role": claims.get("role"),
-            "ref": claims.get("ref"),
-            "iat": claims.get("iat"),
-            "exp": claims.get("exp"),
+    return cacheable(jsonify(WHOAMI_PAYLOAD), WHOAMI_ETAG)
+
+@app.route("/batch", methods=["POST"])
+def batch():
+    """
+    Resolves several GET endpoints in one round-trip, e.g.
+      POST /batch ["/me", "/home/feed"]
+      -> {"/me": {"status": 200, "body": {...}}, "/home/feed": {...}}
+    The caller's Authorization, X-Forwarded-For and remote address are forwarded to each sub-request.
+    """
+    paths = get_json_body()
+    if not isinstance(paths, list) or not paths:
+        return jsonify({
+            "status": "error",
+            "error": "Body must be a non-empty JSON array of paths.",
+        }), 400
+
+    if len(paths) > BATCH_MAX_PATHS:
+        return jsonify({
+            "status": "error",
+            "error": f"At most {BATCH_MAX_PATHS} paths per batch.",
+        }), 400
+
+    # Every path must be a plain path ("//host/..." would be read as a URL with a host)
+    # that resolves to a GET route, so typos come back as a 400 instead of HTML error pages.
+    url_adapter = app.url_map.bind(request.host)
+    bad_paths = []
+    for path in paths:
+        if not isinstance(path, str) or not path.startswith("/") or urlsplit(path).netloc:
+            bad_paths.append(str(path)[:200])
+            continue
+
+        route_path = urlsplit(path).path
+        if route_path.rstrip("/") == "/batch":
+            bad_paths.append(path[:200])
+            continue
+
+        try:
+            url_adapter.match(route_path, method="GET")
+        except HTTPException:
+            bad_paths.append(path[:200])
+
+    if bad_paths:
+        return jsonify({
+            "status": "error",
+            "error": "Invalid path.",
+            "details": bad_paths,
+        }), 400
+
+    # Forward what routes use to identify the caller (get_verified_user_id_from_request, get_client_ip).
+    headers = {}
+    for name in ("Authorization", "X-Forwarded-For"):
+        value = request.headers.get(name)
+        if value:
+            headers[name] = value
+    environ_base = {"REMOTE_ADDR": request.remote_addr or ""}
+
+    results = {}
+    for path in dict.fromkeys(paths):
+        # One failing route is reported for its own path instead of failing the whole batch.
+        try:
+            with app.test_request_context(
+                path,
+                method="GET",
+                headers=headers,
+                base_url=request.host_url,
+                environ_base=environ_base,
+            ):
+                sub_resp = app.full_dispatch_request()
+        except Exception as e:
+            print("[batch] sub-request failed:", path, str(e))
+            results[path] = {
+                "status": 500,
+                "body": {
+                    "status": "error",
+                    "error": "Internal error.",
+                    "details": str(e),
+                },
+            }
+            continue
+
+        results[path] = {
+            "status": sub_resp.status_code,
+            "body": sub_resp.get_json(silent=True) if sub_resp.is_json else sub_resp.get_data(as_text=True),
         }
-    })
+
+    return jsonify(results), 200
 
 @app.route("/me", methods=["GET"])
 def me():
@@ -279,7 +686,7 @@ def update_my_profile():
     if err:
         return err
 
-    data = request.get_json(force=True, silent=True) or {}
+    data = get_json_body() or {}
 
     display_name = str(data.get("display_name") or "").strip()
     username = clean_username(data.get("username"))
@@ -323,7 +730,7 @@ def update_my_profile():
         avatar_url = "assets/avatars/default-avatar-head.png"
 
     existing_username = (
-        supabase.table("profiles")
+        get_supabase().table("profiles")
         .select("id,username")
         .eq("username", username)
         .limit(1)
@@ -350,7 +757,7 @@ def update_my_profile():
         "updated_at": utc_now_iso(),
     }
 
-    res = supabase.table("profiles").upsert(payload).execute()
+    res = get_supabase().table("profiles").upsert(payload, returning=RETURN_MINIMAL).execute()
     err_msg = supa_err(res)
 
     if err_msg:
@@ -371,7 +778,7 @@ def update_my_profile():
 @app.route("/generate", methods=["POST"])
 def generate():
     """
-    Creates:
+    Creates (atomically, via the create_job_with_session RPC):
       1) jobs row (status=queued)
       2) class_sessions row (status=queued, job_id=jobs.id, user_id if available)
     Also sets:
@@ -379,8 +786,28 @@ def generate():
       - demo mode forces: intermediate + 20min + demo music + normal pace
     """
     try:
-        data = request.get_json(force=True, silent=True) or {}
-        requested_plan = normalize_plan(data)
+        data = get_json_body(invalid=INVALID_JSON)
+
+        # 0) Reject malformed requests before any Supabase call
+        if data is INVALID_JSON:
+            return jsonify({
+                "status": "error",
+                "error": "Invalid JSON.",
+            }), 400
+
+        if not isinstance(data, dict):
+            return jsonify({
+                "status": "error",
+                "error": "Request body must be a JSON object.",
+            }), 400
+
+        bad_field = invalid_plan_field(data)
+        if bad_field:
+            return jsonify({
+                "status": "error",
+                "error": f"Invalid {bad_field}.",
+                "field": bad_field,
+            }), 400
 
         # 1) Verify user (or guest)
         user_id = get_verified_user_id_from_request()
@@ -402,99 +829,57 @@ def generate():
         #    - Guest => demo
         #    - Logged in, not pro => demo
         #    - Pro => full
-        plan_tier = get_plan_tier(user_id) if user_id else "free"
-        is_pro = (plan_tier == "pro")
-
         # 2.5) Signed-in users may only have one active job at a time
+        # Both lookups only need user_id, so they run concurrently.
+        plan_tier = "free"
+        active_job_id = None
+
         if user_id:
-            active_job_id = get_active_job_for_user(user_id)
-            if active_job_id:
-                return jsonify({
-                    "status": "conflict",
-                    "error": "You already have a class generating.",
-                    "active_job_id": str(active_job_id),
-                }), 409
+            plan_tier, active_job_id = run_concurrently(
+                (get_plan_tier, user_id),
+                (get_active_job_for_user, user_id),
+            )
+
+        is_pro = (plan_tier == "pro")
+
+        if active_job_id:
+            return jsonify({
+                "status": "conflict",
+                "error": "You already have a class generating.",
+                "active_job_id": str(active_job_id),
+            }), 409
 
         class_mode = "full" if is_pro else "demo"
 
-        # 3) Final plan (forced if demo)
+        # 3) Final plan (forced if demo; only pro requests need normalizing)
         if class_mode == "demo":
-            final_plan = {
-                "difficulty": DEMO_DIFFICULTY,
-                "length_min": DEMO_LENGTH_MIN,
-                "pace": DEMO_PACE,
-                "music": DEMO_MUSIC,
-            }
+            final_plan = DEMO_PLAN
         else:
-            final_plan = requested_plan
-
-        # 4) Create job row
-        job_res = (
-            supabase
-            .table("jobs")
-            .insert({
-                "status": "queued",
-                "plan": final_plan,
-                "error": None,
-                "file_url": None,
-                "storage_path": None,
-            })
-            .execute()
-        )
-
-        job_err = supa_err(job_res)
-        if job_err or not getattr(job_res, "data", None):
-            return jsonify({
-                "status": "error",
-                "error": "Failed to create job row",
-                "details": job_err or "Unknown Supabase error",
-            }), 500
-
-        job_id = job_res.data[0].get("id")
-        if not job_id:
-            return jsonify({"status": "error", "error": "Job row missing id"}), 500
+            final_plan = normalize_plan(data)
 
-        # 5) Create class_sessions row
+        # 4) Create jobs + class_sessions rows in one transaction
         # Guests: public demo sessions (so they can still poll status + play)
         is_public = True if not user_id else False
 
-        sess_payload = {
-            "job_id": job_id,
+        job_res = get_supabase().rpc("create_job_with_session", {
+            "plan": final_plan,
             "user_id": user_id,
+            "class_mode": class_mode,
             "is_public": is_public,
+        }).execute()
 
-            "class_mode": class_mode,   # <-- NEW COLUMN
-            "status": "queued",
-            "plan": final_plan,
-
-            "difficulty": final_plan.get("difficulty"),
-            "length_min": final_plan.get("length_min"),
-            "pace": final_plan.get("pace"),
-            "music": final_plan.get("music"),
-
-            "file_url": None,
-            "error": None,
-            "started_at": None,
-            "completed_at": None,
-            "storage_path": None,
-        }
-
-        sess_res = supabase.table("class_sessions").insert(sess_payload).execute()
-        sess_err = supa_err(sess_res)
-        if sess_err:
-            # rollback job row if session fails (best-effort)
-            try:
-                supabase.table("jobs").delete().eq("id", job_id).execute()
-            except Exception:
-                pass
-
+        job_err = supa_err(job_res)
+        if job_err or not getattr(job_res, "data", None):
             return jsonify({
                 "status": "error",
-                "error": "class_sessions insert failed",
-                "details": sess_err,
-                "job_id": str(job_id),
+                "error": "Failed to create job",
+                "details": job_err or "Unknown Supabase error",
             }), 500
 
+        job_id = job_res.data[0].get("job_id")
+        if not job_id:
+            return jsonify({"status": "error", "error": "Job row missing id"}), 500
+
         if not user_id:
             _guest_last_generate_by_ip[client_ip] = time.time()
 
@@ -568,7 +953,7 @@ def load_profiles_map(user_ids: list[str]):
 
     try:
         res = (
-            supabase.table("profiles")
+            get_supabase().table("profiles")
             .select("id,username,display_name,bio,avatar_url,account_privacy")
             .in_("id", clean_ids)
             .execute()
@@ -581,7 +966,7 @@ def load_profiles_map(user_ids: list[str]):
 def load_following_ids(user_id: str):
     try:
         res = (
-            supabase.table("follows")
+            get_supabase().table("follows")
             .select("following_id")
             .eq("follower_id", user_id)
             .execute()
@@ -593,7 +978,7 @@ def load_following_ids(user_id: str):
 def load_follower_ids(user_id: str):
     try:
         res = (
-            supabase.table("follows")
+            get_supabase().table("follows")
             .select("follower_id")
             .eq("following_id", user_id)
             .execute()
@@ -609,7 +994,7 @@ def load_pending_follow_request_ids(requester_id: str | None):
 
     try:
         res = (
-            supabase.table("follow_requests")
+            get_supabase().table("follow_requests")
             .select("target_id")
             .eq("requester_id", requester_id)
             .eq("status", "pending")
@@ -626,7 +1011,7 @@ def get_pending_follow_request(requester_id: str, target_id: str):
 
     try:
         res = (
-            supabase.table("follow_requests")
+            get_supabase().table("follow_requests")
             .select("*")
             .eq("requester_id", requester_id)
             .eq("target_id", target_id)
@@ -642,7 +1027,7 @@ def get_pending_follow_request(requester_id: str, target_id: str):
 def count_followers(user_id: str):
     try:
         res = (
-            supabase.table("follows")
+            get_supabase().table("follows")
             .select("follower_id")
             .eq("following_id", user_id)
             .execute()
@@ -655,7 +1040,7 @@ def count_followers(user_id: str):
 def count_following(user_id: str):
     try:
         res = (
-            supabase.table("follows")
+            get_supabase().table("follows")
             .select("following_id")
             .eq("follower_id", user_id)
             .execute()
@@ -676,7 +1061,7 @@ def count_gym_members(gym_id: str):
     if not gym_id:
         return 0
     try:
-        res = supabase.table("gym_members").select("user_id").eq("gym_id", gym_id).execute()
+        res = get_supabase().table("gym_members").select("user_id").eq("gym_id", gym_id).execute()
         return len(res.data or [])
     except Exception:
         return 0
@@ -688,7 +1073,7 @@ def get_user_primary_gym(user_id: str | None):
 
     try:
         mem_res = (
-            supabase.table("gym_members")
+            get_supabase().table("gym_members")
             .select("gym_id,role,joined_at")
             .eq("user_id", user_id)
             .order("joined_at", desc=False)
@@ -703,7 +1088,7 @@ def get_user_primary_gym(user_id: str | None):
         gym_id = membership.get("gym_id")
 
         gym_res = (
-            supabase.table("gyms")
+            get_supabase().table("gyms")
             .select("*")
             .eq("id", gym_id)
             .limit(1)
@@ -749,16 +1134,33 @@ def profile_payload(profile: dict | None, viewer_id: str | None = None):
     follow_requested = False
     is_self = bool(viewer_id and profile_id and viewer_id == profile_id)
 
-    if viewer_id and profile_id and not is_self:
-        following = profile_id in load_following_ids(viewer_id)
-        follow_requested = profile_id in load_pending_follow_request_ids(viewer_id)
+    followers_count = 0
+    following_count = 0
+    primary_gym = None
+
+    # The lookups below are independent, so run them concurrently.
+    if profile_id:
+        calls = [
+            (count_followers, profile_id),
+            (count_following, profile_id),
+            (get_user_primary_gym, profile_id),
+        ]
+        if viewer_id and not is_self:
+            calls.append((load_following_ids, viewer_id))
+            calls.append((load_pending_follow_request_ids, viewer_id))
+
+        results = run_concurrently(*calls)
+        followers_count, following_count, primary_gym = results[:3]
+        if len(results) > 3:
+            following = profile_id in results[3]
+            follow_requested = profile_id in results[4]
 
     clean["is_self"] = is_self
     clean["following"] = following
     clean["follow_requested"] = follow_requested
-    clean["followers_count"] = count_followers(profile_id) if profile_id else 0
-    clean["following_count"] = count_following(profile_id) if profile_id else 0
-    clean["primary_gym"] = get_user_primary_gym(profile_id) if profile_id else None
+    clean["followers_count"] = followers_count
+    clean["following_count"] = following_count
+    clean["primary_gym"] = primary_gym
 
     return clean
 
@@ -767,7 +1169,7 @@ def count_post_likes(post_id: str):
     if not post_id:
         return 0
     try:
-        res = supabase.table("post_likes").select("post_id").eq("post_id", post_id).execute()
+        res = get_supabase().table("post_likes").select("post_id").eq("post_id", post_id).execute()
         return len(res.data or [])
     except Exception:
         return 0
@@ -777,7 +1179,7 @@ def count_post_comments(post_id: str):
     if not post_id:
         return 0
     try:
-        res = supabase.table("post_comments").select("id").eq("post_id", post_id).execute()
+        res = get_supabase().table("post_comments").select("id").eq("post_id", post_id).execute()
         return len(res.data or [])
     except Exception:
         return 0
@@ -789,7 +1191,7 @@ def viewer_liked_post(post_id: str, viewer_id: str | None):
 
     try:
         res = (
-            supabase.table("post_likes")
+            get_supabase().table("post_likes")
             .select("post_id,user_id")
             .eq("post_id", post_id)
             .eq("user_id", viewer_id)
@@ -901,7 +1303,7 @@ def create_session_post_for_completed_session(session_row: dict):
         }
 
     existing = (
-        supabase.table("session_posts")
+        get_supabase().table("session_posts")
         .select("*")
         .eq("class_session_id", session_id)
         .limit(1)
@@ -940,6 +1342,7 @@ def create_session_post_for_completed_session(session_row: dict):
     preferred_visibility = "public" if bool(session_row.get("is_public")) else "friends_only"
 
     base_payload = {
+        **SESSION_POST_ROW_DEFAULTS,
         "user_id": str(user_id),
         "class_session_id": str(session_id),
         "job_id": str(job_id) if job_id else None,
@@ -951,8 +1354,6 @@ def create_session_post_for_completed_session(session_row: dict):
         "length_min": length_min if length_min else None,
         "music": str(music),
         "pace": str(pace),
-        "likes_count": 0,
-        "comments_count": 0,
     }
 
     # Remove None values so older schemas are less likely to reject the insert.
@@ -967,7 +1368,7 @@ def create_session_post_for_completed_session(session_row: dict):
         payload = {**base_payload, "visibility": visibility}
 
         try:
-            res = supabase.table("session_posts").insert(payload).execute()
+            res = get_supabase().table("session_posts").insert(payload).execute()
 
             if res.data:
                 return {
@@ -977,7 +1378,7 @@ def create_session_post_for_completed_session(session_row: dict):
 
             # Supabase may insert but return no rows depending on client behavior.
             verify = (
-                supabase.table("session_posts")
+                get_supabase().table("session_posts")
                 .select("*")
                 .eq("class_session_id", session_id)
                 .limit(1)
@@ -998,7 +1399,7 @@ def create_session_post_for_completed_session(session_row: dict):
             # Duplicate race fallback.
             try:
                 retry = (
-                    supabase.table("session_posts")
+                    get_supabase().table("session_posts")
                     .select("*")
                     .eq("class_session_id", session_id)
                     .limit(1)
@@ -1026,7 +1427,7 @@ def listen_heartbeat(job_id):
         return err
 
     job_id = str(job_id or "").strip()
-    data = request.get_json(force=True, silent=True) or {}
+    data = get_json_body() or {}
 
     listened_delta_seconds = max(0, min(20, safe_int(data.get("listened_delta_seconds"), 0)))
     audio_position_seconds = max(0, safe_int(data.get("audio_position_seconds"), 0))
@@ -1040,8 +1441,8 @@ def listen_heartbeat(job_id):
 
     try:
         sess_res = (
-            supabase.table("class_sessions")
-            .select("id,job_id,user_id,is_public,class_mode,status,difficulty,length_min,pace,music,listen_required_seconds,listen_progress_seconds,listened_complete,listened_complete_at,storage_path")
+            get_supabase().table("class_sessions")
+            .select(LISTEN_SESSION_COLUMNS)
             .eq("job_id", job_id)
             .limit(1)
             .execute()
@@ -1087,15 +1488,15 @@ def listen_heartbeat(job_id):
             update_payload["listened_complete"] = True
             update_payload["listened_complete_at"] = utc_now_iso()
 
-        supabase.table("class_sessions").update(update_payload).eq("id", session_row.get("id")).execute()
+        get_supabase().table("class_sessions").update(update_payload, returning=RETURN_MINIMAL).eq("id", session_row.get("id")).execute()
 
         post = None
         post_error = None
 
         if already_complete or completed_now:
             refreshed = (
-                supabase.table("class_sessions")
-                .select("id,job_id,user_id,is_public,class_mode,status,difficulty,length_min,pace,music,listen_required_seconds,listen_progress_seconds,listened_complete,listened_complete_at,storage_path")
+                get_supabase().table("class_sessions")
+                .select(LISTEN_SESSION_COLUMNS)
                 .eq("id", session_row.get("id"))
                 .limit(1)
                 .execute()
@@ -1139,7 +1540,7 @@ def home_feed():
 
         # Normal verified session posts.
         posts_res = (
-            supabase.table("session_posts")
+            get_supabase().table("session_posts")
             .select("*")
             .order("created_at", desc=True)
             .limit(60)
@@ -1161,7 +1562,7 @@ def home_feed():
                 can_see = True
             elif visibility == "public":
                 can_see = True
-            elif visibility in ("friends", "friends_only", "followers", "followers_only") and author_id in allowed_user_ids:
+            elif visibility in FOLLOWER_VISIBILITIES and author_id in allowed_user_ids:
                 can_see = True
 
             if can_see:
@@ -1181,7 +1582,7 @@ def home_feed():
 
         if gym:
             gym_posts_res = (
-                supabase.table("gym_posts")
+                get_supabase().table("gym_posts")
                 .select("*")
                 .eq("gym_id", gym["id"])
                 .in_("kind", ["session", "system"])
@@ -1199,7 +1600,7 @@ def home_feed():
 
             if session_post_ids:
                 linked_res = (
-                    supabase.table("session_posts")
+                    get_supabase().table("session_posts")
                     .select("*")
                     .in_("id", session_post_ids)
                     .execute()
@@ -1243,7 +1644,7 @@ def home_notifications():
 
     try:
         res = (
-            supabase.table("notifications")
+            get_supabase().table("notifications")
             .select("*")
             .eq("user_id", uid)
             .order("created_at", desc=True)
@@ -1294,9 +1695,9 @@ def mark_notification_read(notification_id):
     notification_id = str(notification_id or "").strip()
 
     try:
-        supabase.table("notifications").update({
+        get_supabase().table("notifications").update({
             "read": True,
-        }).eq("id", notification_id).eq("user_id", uid).execute()
+        }, returning=RETURN_MINIMAL).eq("id", notification_id).eq("user_id", uid).execute()
 
         return jsonify({
             "status": "ok",
@@ -1321,7 +1722,7 @@ def home_suggestions():
         following_ids = load_following_ids(uid)
 
         res = (
-            supabase.table("profiles")
+            get_supabase().table("profiles")
             .select("id,username,display_name,bio,avatar_url,account_privacy")
             .neq("id", uid)
             .limit(60)
@@ -1386,9 +1787,9 @@ def follow_user(target_user_id):
 
     try:
         if request.method == "DELETE":
-            supabase.table("follows").delete().eq("follower_id", uid).eq("following_id", target_user_id).execute()
+            get_supabase().table("follows").delete(returning=RETURN_MINIMAL).eq("follower_id", uid).eq("following_id", target_user_id).execute()
             try:
-                supabase.table("follow_requests").delete().eq("requester_id", uid).eq("target_id", target_user_id).eq("status", "pending").execute()
+                get_supabase().table("follow_requests").delete(returning=RETURN_MINIMAL).eq("requester_id", uid).eq("target_id", target_user_id).eq("status", "pending").execute()
             except Exception:
                 pass
 
@@ -1407,7 +1808,7 @@ def follow_user(target_user_id):
             }), 404
 
         existing = (
-            supabase.table("follows")
+            get_supabase().table("follows")
             .select("follower_id,following_id")
             .eq("follower_id", uid)
             .eq("following_id", target_user_id)
@@ -1431,13 +1832,13 @@ def follow_user(target_user_id):
             pending = get_pending_follow_request(uid, target_user_id)
 
             if not pending:
-                req_res = supabase.table("follow_requests").insert({
+                req_res = get_supabase().table("follow_requests").insert({
                     "requester_id": uid,
                     "target_id": target_user_id,
                     "status": "pending",
                     "created_at": utc_now_iso(),
                     "updated_at": utc_now_iso(),
-                }).execute()
+                }, returning=RETURN_MINIMAL).execute()
 
                 req_err = supa_err(req_res)
                 if req_err:
@@ -1464,10 +1865,10 @@ def follow_user(target_user_id):
                 "target_user_id": target_user_id,
             }), 200
 
-        insert_res = supabase.table("follows").insert({
+        insert_res = get_supabase().table("follows").insert({
             "follower_id": uid,
             "following_id": target_user_id,
-        }).execute()
+        }, returning=RETURN_MINIMAL).execute()
 
         insert_err = supa_err(insert_res)
         if insert_err:
@@ -1478,7 +1879,7 @@ def follow_user(target_user_id):
             }), 500
 
         try:
-            supabase.table("follow_requests").delete().eq("requester_id", uid).eq("target_id", target_user_id).execute()
+            get_supabase().table("follow_requests").delete(returning=RETURN_MINIMAL).eq("requester_id", uid).eq("target_id", target_user_id).execute()
         except Exception:
             pass
 
@@ -1515,7 +1916,7 @@ def my_follow_requests():
 
     try:
         req_res = (
-            supabase.table("follow_requests")
+            get_supabase().table("follow_requests")
             .select("*")
             .eq("target_id", uid)
             .eq("status", "pending")
@@ -1565,7 +1966,7 @@ def accept_follow_request(request_id):
 
     try:
         req_res = (
-            supabase.table("follow_requests")
+            get_supabase().table("follow_requests")
             .select("*")
             .eq("id", request_id)
             .eq("target_id", uid)
@@ -1584,7 +1985,7 @@ def accept_follow_request(request_id):
         requester_id = str(row.get("requester_id") or "")
 
         existing = (
-            supabase.table("follows")
+            get_supabase().table("follows")
             .select("follower_id,following_id")
             .eq("follower_id", requester_id)
             .eq("following_id", uid)
@@ -1593,15 +1994,15 @@ def accept_follow_request(request_id):
         )
 
         if not existing.data:
-            supabase.table("follows").insert({
+            get_supabase().table("follows").insert({
                 "follower_id": requester_id,
                 "following_id": uid,
-            }).execute()
+            }, returning=RETURN_MINIMAL).execute()
 
-        supabase.table("follow_requests").update({
+        get_supabase().table("follow_requests").update({
             "status": "accepted",
             "updated_at": utc_now_iso(),
-        }).eq("id", request_id).execute()
+        }, returning=RETURN_MINIMAL).eq("id", request_id).execute()
 
         target_profile = ensure_profile_row(uid)
         target_name = profile_display_name(target_profile)
@@ -1640,7 +2041,7 @@ def decline_follow_request(request_id):
 
     try:
         req_res = (
-            supabase.table("follow_requests")
+            get_supabase().table("follow_requests")
             .select("*")
             .eq("id", request_id)
             .eq("target_id", uid)
@@ -1655,10 +2056,10 @@ def decline_follow_request(request_id):
                 "error": "Follow request not found.",
             }), 404
 
-        supabase.table("follow_requests").update({
+        get_supabase().table("follow_requests").update({
             "status": "declined",
             "updated_at": utc_now_iso(),
-        }).eq("id", request_id).execute()
+        }, returning=RETURN_MINIMAL).eq("id", request_id).execute()
 
         return jsonify({
             "status": "ok",
@@ -1691,7 +2092,7 @@ def profile_posts(profile_id):
         is_following_profile = bool(profile_id in following_ids)
 
         profile_res = (
-            supabase.table("profiles")
+            get_supabase().table("profiles")
             .select("id,username,display_name,bio,avatar_url,account_privacy")
             .eq("id", profile_id)
             .limit(1)
@@ -1717,7 +2118,7 @@ def profile_posts(profile_id):
             }), 403
 
         posts_res = (
-            supabase.table("session_posts")
+            get_supabase().table("session_posts")
             .select("*")
             .eq("user_id", profile_id)
             .order("created_at", desc=True)
@@ -1736,7 +2137,7 @@ def profile_posts(profile_id):
                 can_see = True
             elif visibility == "public":
                 can_see = True
-            elif visibility in ("friends", "friends_only", "followers", "followers_only") and is_following_profile:
+            elif visibility in FOLLOWER_VISIBILITIES and is_following_profile:
                 can_see = True
 
             if can_see:
@@ -1771,7 +2172,7 @@ def can_view_post(row: dict, viewer_id: str | None):
     if visibility == "public":
         return True
 
-    if visibility in ("friends", "friends_only", "followers", "followers_only"):
+    if visibility in FOLLOWER_VISIBILITIES:
         if not viewer_id:
             return False
         following_ids = load_following_ids(viewer_id)
@@ -1785,7 +2186,7 @@ def load_post_row(post_id: str):
         return None
 
     res = (
-        supabase.table("session_posts")
+        get_supabase().table("session_posts")
         .select("*")
         .eq("id", post_id)
         .limit(1)
@@ -1803,15 +2204,48 @@ def update_post_counts(post_id: str):
     comments_count = count_post_comments(post_id)
 
     try:
-        supabase.table("session_posts").update({
+        get_supabase().table("session_posts").update({
             "likes_count": likes_count,
             "comments_count": comments_count,
             "updated_at": utc_now_iso(),
-        }).eq("id", post_id).execute()
+        }, returning=RETURN_MINIMAL).eq("id", post_id).execute()
     except Exception:
         pass
 
 
+def _post_counts_worker(post_id: str):
+    while True:
+        try:
+            update_post_counts(post_id)
+        except Exception as e:
+            print("[post_counts] refresh failed:", str(e), "post_id=", post_id)
+
+        with _post_counts_lock:
+            if post_id in _post_counts_pending:
+                _post_counts_pending.discard(post_id)
+                continue
+            _post_counts_running.discard(post_id)
+            return
+
+
+def schedule_post_counts(post_id: str):
+    """
+    Refresh a post's denormalized counters on EXECUTOR without blocking the response.
+    At most one refresh per post runs at a time; changes that land mid-refresh trigger
+    one more pass, so overlapping recounts can't finish out of order and leave a stale count.
+    """
+    if not post_id:
+        return
+
+    with _post_counts_lock:
+        if post_id in _post_counts_running:
+            _post_counts_pending.add(post_id)
+            return
+        _post_counts_running.add(post_id)
+
+    EXECUTOR.submit(_post_counts_worker, post_id)
+
+
 @app.route("/session-post/<post_id>", methods=["PATCH", "DELETE"])
 def update_or_delete_session_post(post_id):
     uid, err = require_user_id()
@@ -1835,7 +2269,7 @@ def update_or_delete_session_post(post_id):
 
     if request.method == "DELETE":
         try:
-            supabase.table("session_posts").delete().eq("id", post_id).execute()
+            get_supabase().table("session_posts").delete(returning=RETURN_MINIMAL).eq("id", post_id).execute()
             return jsonify({
                 "status": "ok",
                 "deleted": True,
@@ -1848,7 +2282,7 @@ def update_or_delete_session_post(post_id):
                 "details": str(e),
             }), 500
 
-    data = request.get_json(force=True, silent=True) or {}
+    data = get_json_body() or {}
 
     title = str(data.get("title") or "").strip()
     body = str(data.get("body") or "").strip()
@@ -1883,7 +2317,7 @@ def update_or_delete_session_post(post_id):
         }
 
         res = (
-            supabase.table("session_posts")
+            get_supabase().table("session_posts")
             .update(update_payload)
             .eq("id", post_id)
             .execute()
@@ -1928,8 +2362,8 @@ def like_session_post(post_id):
 
     try:
         if request.method == "DELETE":
-            supabase.table("post_likes").delete().eq("post_id", post_id).eq("user_id", uid).execute()
-            update_post_counts(post_id)
+            get_supabase().table("post_likes").delete(returning=RETURN_MINIMAL).eq("post_id", post_id).eq("user_id", uid).execute()
+            schedule_post_counts(post_id)
 
             return jsonify({
                 "status": "ok",
@@ -1938,7 +2372,7 @@ def like_session_post(post_id):
             }), 200
 
         existing = (
-            supabase.table("post_likes")
+            get_supabase().table("post_likes")
             .select("post_id,user_id")
             .eq("post_id", post_id)
             .eq("user_id", uid)
@@ -1947,10 +2381,10 @@ def like_session_post(post_id):
         )
 
         if not existing.data:
-            supabase.table("post_likes").insert({
+            get_supabase().table("post_likes").insert({
                 "post_id": post_id,
                 "user_id": uid,
-            }).execute()
+            }, returning=RETURN_MINIMAL).execute()
 
             owner_id = str(row.get("user_id") or "")
             actor_profile = ensure_profile_row(uid)
@@ -1966,7 +2400,7 @@ def like_session_post(post_id):
                 post_id,
             )
 
-        update_post_counts(post_id)
+        schedule_post_counts(post_id)
 
         return jsonify({
             "status": "ok",
@@ -2004,7 +2438,7 @@ def session_post_comments(post_id):
         }), 403
 
     if request.method == "POST":
-        data = request.get_json(force=True, silent=True) or {}
+        data = get_json_body() or {}
         body = str(data.get("body") or "").strip()
 
         if not body:
@@ -2020,13 +2454,13 @@ def session_post_comments(post_id):
             }), 400
 
         try:
-            insert_res = supabase.table("post_comments").insert({
+            insert_res = get_supabase().table("post_comments").insert({
                 "post_id": post_id,
                 "user_id": uid,
                 "body": body,
             }).execute()
 
-            update_post_counts(post_id)
+            schedule_post_counts(post_id)
 
             owner_id = str(row.get("user_id") or "")
             actor_profile = ensure_profile_row(uid)
@@ -2060,7 +2494,7 @@ def session_post_comments(post_id):
 
     try:
         comments_res = (
-            supabase.table("post_comments")
+            get_supabase().table("post_comments")
             .select("*")
             .eq("post_id", post_id)
             .order("created_at", desc=False)
@@ -2095,7 +2529,7 @@ def delete_session_comment(comment_id):
 
     try:
         comment_res = (
-            supabase.table("post_comments")
+            get_supabase().table("post_comments")
             .select("*")
             .eq("id", comment_id)
             .limit(1)
@@ -2121,8 +2555,8 @@ def delete_session_comment(comment_id):
                 "error": "Forbidden.",
             }), 403
 
-        supabase.table("post_comments").delete().eq("id", comment_id).execute()
-        update_post_counts(post_id)
+        get_supabase().table("post_comments").delete(returning=RETURN_MINIMAL).eq("id", comment_id).execute()
+        schedule_post_counts(post_id)
 
         return jsonify({
             "status": "ok",
@@ -2166,6 +2600,31 @@ def clean_notification_uuid(value):
     return None
 
 
+def build_notification_payload(
+    user_id: str,
+    actor_id: str | None,
+    type_: str,
+    title: str,
+    body: str = "",
+    entity_type: str | None = None,
+    entity_id: str | None = None,
+):
+    base_payload = {
+        "user_id": str(user_id),
+        "actor_id": str(actor_id) if actor_id else None,
+        "type": str(type_ or "notification")[:80],
+        "title": str(title or "Notification")[:120],
+        "body": str(body or "")[:500],
+        "entity_type": str(entity_type)[:80] if entity_type else None,
+    }
+
+    clean_entity_id = clean_notification_uuid(entity_id)
+    if clean_entity_id:
+        base_payload["entity_id"] = clean_entity_id
+
+    return {k: v for k, v in base_payload.items() if v is not None}
+
+
 def create_notification(
     user_id: str | None,
     actor_id: str | None,
@@ -2189,78 +2648,176 @@ def create_notification(
             "reason": "self_notification",
         }
 
-    base_payload = {
-        "user_id": str(user_id),
-        "actor_id": str(actor_id) if actor_id else None,
-        "type": str(type_ or "notification")[:80],
-        "title": str(title or "Notification")[:120],
-        "body": str(body or "")[:500],
-        "entity_type": str(entity_type)[:80] if entity_type else None,
+    enqueue_notification(
+        build_notification_payload(user_id, actor_id, type_, title, body, entity_type, entity_id)
+    )
+
+    return {
+        "ok": True,
+        "queued": True,
     }
 
-    clean_entity_id = clean_notification_uuid(entity_id)
-    if clean_entity_id:
-        base_payload["entity_id"] = clean_entity_id
 
-    base_payload = {k: v for k, v in base_payload.items() if v is not None}
+def insert_notifications(payloads: list[dict]):
+    """
+    Insert many notifications with one multi-row request.
+    The read-flag variant is resolved on the first insert and reused after that.
+    row_error is True when PostgREST rejected a row (23xxx) rather than the whole request failing.
+    """
+    global _notification_read_flag
+    from postgrest.exceptions import APIError
 
-    # Try a few safe variants because earlier versions may have had slightly different schemas.
-    payload_attempts = [
-        {**base_payload, "read": False},
-        {**base_payload, "is_read": False},
-        base_payload,
-    ]
+    if not payloads:
+        return {
+            "ok": True,
+            "count": 0,
+        }
 
+    read_flags = NOTIFICATION_READ_FLAGS if _notification_read_flag is None else (_notification_read_flag,)
     last_error = None
 
-    for payload in payload_attempts:
-        try:
-            res = supabase.table("notifications").insert(payload).execute()
-            err_msg = supa_err(res)
+    for read_flag in read_flags:
+        rows = [{**payload, **read_flag} for payload in payloads]
 
-            if err_msg:
-                last_error = err_msg
-                print("[create_notification] insert response error:", err_msg, "payload_keys=", list(payload.keys()))
+        try:
+            res = get_supabase().table("notifications").insert(rows, returning=RETURN_MINIMAL).execute()
+        except APIError as e:
+            code = str(e.code or "")
+            last_error = e.message or repr(e)
+
+            if code in NOTIFICATION_MISSING_COLUMN_CODES:
+                # This variant's column doesn't exist; try the next one (and re-resolve next time).
+                _notification_read_flag = None
                 continue
 
-            if getattr(res, "data", None):
-                print("[create_notification] created:", res.data[0])
-                return {
-                    "ok": True,
-                    "notification": res.data[0],
-                }
+            print("[insert_notifications] insert rejected:", code, last_error, "rows=", len(rows))
 
-            # Some Supabase responses can succeed but return no rows.
-            verify = (
-                supabase.table("notifications")
-                .select("*")
-                .eq("user_id", str(user_id))
-                .eq("type", str(type_ or "notification")[:80])
-                .order("created_at", desc=True)
-                .limit(1)
-                .execute()
-            )
+            row_error = code.startswith("23")
+            if row_error:
+                # Columns resolve before constraints run, so this variant is the right one.
+                _notification_read_flag = read_flag
 
-            if verify.data:
-                print("[create_notification] created verified:", verify.data[0])
-                return {
-                    "ok": True,
-                    "notification": verify.data[0],
-                }
+            return {
+                "ok": False,
+                "error": last_error,
+                "row_error": row_error,
+            }
+        except Exception as e:
+            print("[insert_notifications] failed:", str(e), "rows=", len(rows))
+            return {
+                "ok": False,
+                "error": str(e),
+                "row_error": False,
+            }
 
-            last_error = "insert_returned_no_data"
-            print("[create_notification] no data after insert payload_keys=", list(payload.keys()))
+        err_msg = supa_err(res)
+        if err_msg:
+            print("[insert_notifications] insert response error:", err_msg, "rows=", len(rows))
+            return {
+                "ok": False,
+                "error": err_msg,
+                "row_error": False,
+            }
 
-        except Exception as e:
-            last_error = str(e)
-            print("[create_notification] failed:", str(e), "payload_keys=", list(payload.keys()))
+        _notification_read_flag = read_flag
+        return {
+            "ok": True,
+            "count": len(rows),
+        }
 
     return {
         "ok": False,
         "error": last_error or "notification_insert_failed",
+        "row_error": False,
     }
 
 
+def insert_notifications_isolated(payloads: list[dict]):
+    """
+    A multi-row insert is all-or-nothing, so one bad row (e.g. an FK violation on a
+    deleted user) would sink the whole batch. When a row is rejected, split the batch
+    in half and retry each side until only the bad rows are dropped. Any other failure
+    (connection, timeout, permissions) drops the batch rather than multiplying requests.
+    """
+    result = insert_notifications(payloads)
+    if result.get("ok"):
+        return
+
+    if result.get("row_error") and len(payloads) > 1:
+        middle = len(payloads) // 2
+        insert_notifications_isolated(payloads[:middle])
+        insert_notifications_isolated(payloads[middle:])
+        return
+
+    print("[flush_notifications] dropped notifications:", result.get("error"), "rows=", len(payloads))
+
+
+def flush_notifications(payloads: list[dict]):
+    # A multi-row insert needs every row to have the same keys.
+    by_keys = {}
+    for payload in payloads:
+        by_keys.setdefault(tuple(sorted(payload)), []).append(payload)
+
+    for group in by_keys.values():
+        insert_notifications_isolated(group)
+
+
+def _notification_flush_loop():
+    while True:
+        batch = [_notification_queue.get()]
+        deadline = time.monotonic() + NOTIFICATION_FLUSH_SECONDS
+
+        while len(batch) < NOTIFICATION_BATCH_MAX_ROWS:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_notification_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        try:
+            flush_notifications(batch)
+        except Exception as e:
+            print("[notification_batcher] flush failed:", str(e), "rows=", len(batch))
+
+
+def _drain_notification_queue():
+    batch = []
+    while True:
+        try:
+            batch.append(_notification_queue.get_nowait())
+        except queue.Empty:
+            break
+
+    if batch:
+        flush_notifications(batch)
+
+
+def enqueue_notification(payload: dict):
+    """
+    Queue a notification row for the background batcher, which coalesces rows
+    arriving within NOTIFICATION_FLUSH_SECONDS into one multi-row insert.
+    """
+    global _notification_worker
+
+    if _notification_worker is None:
+        with _notification_worker_lock:
+            if _notification_worker is None:
+                _notification_worker = threading.Thread(
+                    target=_notification_flush_loop,
+                    name="notification-batcher",
+                    daemon=True,
+                )
+                _notification_worker.start()
+                atexit.register(_drain_notification_queue)
+
+    try:
+        _notification_queue.put_nowait(payload)
+    except queue.Full:
+        print("[enqueue_notification] queue full, dropping notification user_id=", payload.get("user_id"))
+
+
 def notify_gym_members(
     gym_id: str,
     actor_id: str | None,
@@ -2275,16 +2832,15 @@ def notify_gym_members(
 
     try:
         members = (
-            supabase.table("gym_members")
+            get_supabase().table("gym_members")
             .select("user_id")
             .eq("gym_id", gym_id)
             .execute()
         )
 
-        for row in (members.data or []):
-            member_id = row.get("user_id")
-            create_notification(
-                member_id,
+        payloads = [
+            build_notification_payload(
+                row.get("user_id"),
                 actor_id,
                 type_,
                 title,
@@ -2292,6 +2848,12 @@ def notify_gym_members(
                 entity_type,
                 entity_id or gym_id,
             )
+            for row in (members.data or [])
+            if row.get("user_id") and str(row.get("user_id")) != str(actor_id or "")
+        ]
+
+        for payload in payloads:
+            enqueue_notification(payload)
     except Exception:
         pass
 
@@ -2300,7 +2862,7 @@ def get_my_gym_membership(user_id: str):
         return None, None
 
     mem_res = (
-        supabase.table("gym_members")
+        get_supabase().table("gym_members")
         .select("gym_id,user_id,role,joined_at")
         .eq("user_id", user_id)
         .order("joined_at", desc=False)
@@ -2315,7 +2877,7 @@ def get_my_gym_membership(user_id: str):
     gym_id = membership.get("gym_id")
 
     gym_res = (
-        supabase.table("gyms")
+        get_supabase().table("gyms")
         .select("*")
         .eq("id", gym_id)
         .limit(1)
@@ -2334,7 +2896,7 @@ def user_is_gym_member(gym_id: str, user_id: str):
 
     try:
         res = (
-            supabase.table("gym_members")
+            get_supabase().table("gym_members")
             .select("gym_id,user_id")
             .eq("gym_id", gym_id)
             .eq("user_id", user_id)
@@ -2349,7 +2911,7 @@ def user_is_gym_member(gym_id: str, user_id: str):
 def load_gym_members(gym_id: str):
     try:
         mem_res = (
-            supabase.table("gym_members")
+            get_supabase().table("gym_members")
             .select("gym_id,user_id,role,joined_at")
             .eq("gym_id", gym_id)
             .order("joined_at", desc=False)
@@ -2400,7 +2962,7 @@ def safe_gym_post(row: dict, profiles_by_id: dict, session_posts_by_id: dict | N
 
 def load_gym_posts(gym_id: str, viewer_id: str):
     posts_res = (
-        supabase.table("gym_posts")
+        get_supabase().table("gym_posts")
         .select("*")
         .eq("gym_id", gym_id)
         .order("created_at", desc=True)
@@ -2417,7 +2979,7 @@ def load_gym_posts(gym_id: str, viewer_id: str):
 
     if session_post_ids:
         sp_res = (
-            supabase.table("session_posts")
+            get_supabase().table("session_posts")
             .select("*")
             .in_("id", session_post_ids)
             .execute()
@@ -2436,10 +2998,10 @@ def load_gym_posts(gym_id: str, viewer_id: str):
 def refresh_gym_member_count(gym_id: str):
     total = count_gym_members(gym_id)
     try:
-        supabase.table("gyms").update({
+        get_supabase().table("gyms").update({
             "member_count": total,
             "updated_at": utc_now_iso(),
-        }).eq("id", gym_id).execute()
+        }, returning=RETURN_MINIMAL).eq("id", gym_id).execute()
     except Exception:
         pass
     return total
@@ -2496,7 +3058,7 @@ def discover_gyms():
         my_gym_id = str(my_gym.get("id")) if my_gym else None
 
         res = (
-            supabase.table("gyms")
+            get_supabase().table("gyms")
             .select("*")
             .eq("visibility", "public")
             .order("created_at", desc=True)
@@ -2540,7 +3102,7 @@ def create_gym():
     if err:
         return err
 
-    data = request.get_json(force=True, silent=True) or {}
+    data = get_json_body() or {}
 
     name = str(data.get("name") or "").strip()
     description = str(data.get("description") or "").strip()
@@ -2576,7 +3138,7 @@ def create_gym():
         for i in range(0, 20):
             test_slug = base_slug if i == 0 else f"{base_slug}-{i + 1}"
             exists = (
-                supabase.table("gyms")
+                get_supabase().table("gyms")
                 .select("id")
                 .eq("slug", test_slug)
                 .limit(1)
@@ -2599,7 +3161,7 @@ def create_gym():
             "updated_at": utc_now_iso(),
         }
 
-        gym_res = supabase.table("gyms").insert(gym_payload).execute()
+        gym_res = get_supabase().table("gyms").insert(gym_payload).execute()
 
         if not gym_res.data:
             return jsonify({
@@ -2610,19 +3172,19 @@ def create_gym():
         gym_row = gym_res.data[0]
         gym_id = gym_row.get("id")
 
-        supabase.table("gym_members").insert({
+        get_supabase().table("gym_members").insert({
             "gym_id": gym_id,
             "user_id": uid,
             "role": "owner",
             "joined_at": utc_now_iso(),
-        }).execute()
+        }, returning=RETURN_MINIMAL).execute()
 
-        supabase.table("gym_posts").insert({
+        get_supabase().table("gym_posts").insert({
             "gym_id": gym_id,
             "user_id": uid,
             "kind": "system",
             "body": f"{name} was created.",
-        }).execute()
+        }, returning=RETURN_MINIMAL).execute()
 
         return jsonify({
             "status": "ok",
@@ -2642,7 +3204,7 @@ def get_gym_role(gym_id: str, user_id: str):
 
     try:
         res = (
-            supabase.table("gym_members")
+            get_supabase().table("gym_members")
             .select("role")
             .eq("gym_id", gym_id)
             .eq("user_id", user_id)
@@ -2673,7 +3235,7 @@ def update_gym(gym_id):
             "error": "Only a gym owner or admin can edit this gym.",
         }), 403
 
-    data = request.get_json(force=True, silent=True) or {}
+    data = get_json_body() or {}
 
     name = str(data.get("name") or "").strip()
     description = str(data.get("description") or "").strip()
@@ -2696,7 +3258,7 @@ def update_gym(gym_id):
 
     try:
         update_res = (
-            supabase.table("gyms")
+            get_supabase().table("gyms")
             .update({
                 "name": name,
                 "description": description,
@@ -2716,7 +3278,7 @@ def update_gym(gym_id):
             }), 500
 
         gym_res = (
-            supabase.table("gyms")
+            get_supabase().table("gyms")
             .select("*")
             .eq("id", gym_id)
             .limit(1)
@@ -2761,7 +3323,7 @@ def delete_gym(gym_id):
         }), 403
 
     try:
-        supabase.table("gyms").delete().eq("id", gym_id).execute()
+        get_supabase().table("gyms").delete(returning=RETURN_MINIMAL).eq("id", gym_id).execute()
 
         return jsonify({
             "status": "ok",
@@ -2794,7 +3356,7 @@ def join_gym(gym_id):
             }), 409
 
         gym_res = (
-            supabase.table("gyms")
+            get_supabase().table("gyms")
             .select("*")
             .eq("id", gym_id)
             .limit(1)
@@ -2815,24 +3377,24 @@ def join_gym(gym_id):
                 "error": "This gym is private.",
             }), 403
 
-        supabase.table("gym_members").insert({
+        get_supabase().table("gym_members").insert({
             "gym_id": gym_id,
             "user_id": uid,
             "role": "member",
             "joined_at": utc_now_iso(),
-        }).execute()
+        }, returning=RETURN_MINIMAL).execute()
 
         refresh_gym_member_count(gym_id)
 
         profile = ensure_profile_row(uid)
         display = profile_display_name(profile)
 
-        supabase.table("gym_posts").insert({
+        get_supabase().table("gym_posts").insert({
             "gym_id": gym_id,
             "user_id": uid,
             "kind": "system",
             "body": f"{display} joined the gym.",
-        }).execute()
+        }, returning=RETURN_MINIMAL).execute()
 
         notify_gym_members(
             gym_id,
@@ -2870,7 +3432,7 @@ def leave_gym(gym_id):
 
     try:
         mem_res = (
-            supabase.table("gym_members")
+            get_supabase().table("gym_members")
             .select("gym_id,user_id,role")
             .eq("gym_id", gym_id)
             .eq("user_id", uid)
@@ -2888,7 +3450,7 @@ def leave_gym(gym_id):
 
         if role == "owner":
             other_members = (
-                supabase.table("gym_members")
+                get_supabase().table("gym_members")
                 .select("user_id")
                 .eq("gym_id", gym_id)
                 .neq("user_id", uid)
@@ -2902,11 +3464,11 @@ def leave_gym(gym_id):
                     "error": "Owner cannot leave while other members remain. Transfer ownership later, or remove members first.",
                 }), 409
 
-        supabase.table("gym_members").delete().eq("gym_id", gym_id).eq("user_id", uid).execute()
+        get_supabase().table("gym_members").delete(returning=RETURN_MINIMAL).eq("gym_id", gym_id).eq("user_id", uid).execute()
         remaining = refresh_gym_member_count(gym_id)
 
         if remaining <= 0:
-            supabase.table("gyms").delete().eq("id", gym_id).execute()
+            get_supabase().table("gyms").delete(returning=RETURN_MINIMAL).eq("id", gym_id).execute()
 
         return jsonify({
             "status": "ok",
@@ -2961,15 +3523,15 @@ def remove_gym_member(gym_id, member_user_id):
         member_profile = ensure_profile_row(member_user_id)
         member_name = profile_display_name(member_profile)
 
-        supabase.table("gym_members").delete().eq("gym_id", gym_id).eq("user_id", member_user_id).execute()
+        get_supabase().table("gym_members").delete(returning=RETURN_MINIMAL).eq("gym_id", gym_id).eq("user_id", member_user_id).execute()
         remaining = refresh_gym_member_count(gym_id)
 
-        supabase.table("gym_posts").insert({
+        get_supabase().table("gym_posts").insert({
             "gym_id": gym_id,
             "user_id": uid,
             "kind": "system",
             "body": f"{member_name} was removed from the gym.",
-        }).execute()
+        }, returning=RETURN_MINIMAL).execute()
 
         create_notification(
             member_user_id,
@@ -3031,7 +3593,7 @@ def gym_posts(gym_id):
         }), 403
 
     if request.method == "POST":
-        data = request.get_json(force=True, silent=True) or {}
+        data = get_json_body() or {}
         body = str(data.get("body") or "").strip()
 
         if not body:
@@ -3047,12 +3609,12 @@ def gym_posts(gym_id):
             }), 400
 
         try:
-            supabase.table("gym_posts").insert({
+            get_supabase().table("gym_posts").insert({
                 "gym_id": gym_id,
                 "user_id": uid,
                 "kind": "message",
                 "body": body,
-            }).execute()
+            }, returning=RETURN_MINIMAL).execute()
 
             actor_profile = ensure_profile_row(uid)
             actor_name = profile_display_name(actor_profile)
@@ -3108,7 +3670,7 @@ def create_gym_invite(gym_id):
 
     try:
         existing = (
-            supabase.table("gym_invites")
+            get_supabase().table("gym_invites")
             .select("*")
             .eq("gym_id", gym_id)
             .eq("created_by", uid)
@@ -3123,7 +3685,7 @@ def create_gym_invite(gym_id):
         else:
             code = base64.urlsafe_b64encode(os.urandom(9)).decode("utf-8").replace("=", "")
 
-            invite_res = supabase.table("gym_invites").insert({
+            invite_res = get_supabase().table("gym_invites").insert({
                 "gym_id": gym_id,
                 "created_by": uid,
                 "code": code,
@@ -3170,7 +3732,7 @@ def join_gym_by_code(code):
             }), 409
 
         invite_res = (
-            supabase.table("gym_invites")
+            get_supabase().table("gym_invites")
             .select("*")
             .eq("code", code)
             .eq("active", True)
@@ -3188,7 +3750,7 @@ def join_gym_by_code(code):
         gym_id = str(invite.get("gym_id") or "")
 
         gym_res = (
-            supabase.table("gyms")
+            get_supabase().table("gyms")
             .select("*")
             .eq("id", gym_id)
             .limit(1)
@@ -3201,24 +3763,24 @@ def join_gym_by_code(code):
                 "error": "Gym not found.",
             }), 404
 
-        supabase.table("gym_members").insert({
+        get_supabase().table("gym_members").insert({
             "gym_id": gym_id,
             "user_id": uid,
             "role": "member",
             "joined_at": utc_now_iso(),
-        }).execute()
+        }, returning=RETURN_MINIMAL).execute()
 
         refresh_gym_member_count(gym_id)
 
         profile = ensure_profile_row(uid)
         display = profile_display_name(profile)
 
-        supabase.table("gym_posts").insert({
+        get_supabase().table("gym_posts").insert({
             "gym_id": gym_id,
             "user_id": uid,
             "kind": "system",
             "body": f"{display} joined by invite code.",
-        }).execute()
+        }, returning=RETURN_MINIMAL).execute()
 
         notify_gym_members(
             gym_id,
@@ -3260,12 +3822,12 @@ def share_session_to_gym(gym_id):
         }), 403
 
     try:
-        data = request.get_json(force=True, silent=True) or {}
+        data = get_json_body() or {}
         session_post_id = str(data.get("session_post_id") or "").strip()
 
         if not session_post_id:
             latest = (
-                supabase.table("session_posts")
+                get_supabase().table("session_posts")
                 .select("*")
                 .eq("user_id", uid)
                 .order("created_at", desc=True)
@@ -3282,7 +3844,7 @@ def share_session_to_gym(gym_id):
             session_post_id = str(latest.data[0].get("id") or "")
 
         post_res = (
-            supabase.table("session_posts")
+            get_supabase().table("session_posts")
             .select("*")
             .eq("id", session_post_id)
             .eq("user_id", uid)
@@ -3297,7 +3859,7 @@ def share_session_to_gym(gym_id):
             }), 404
 
         existing = (
-            supabase.table("gym_posts")
+            get_supabase().table("gym_posts")
             .select("id")
             .eq("gym_id", gym_id)
             .eq("session_post_id", session_post_id)
@@ -3307,13 +3869,13 @@ def share_session_to_gym(gym_id):
 
         if not existing.data:
             title = post_res.data[0].get("title") or "Completed a Corner class."
-            supabase.table("gym_posts").insert({
+            get_supabase().table("gym_posts").insert({
                 "gym_id": gym_id,
                 "user_id": uid,
                 "kind": "session",
                 "body": title,
                 "session_post_id": session_post_id,
-            }).execute()
+            }, returning=RETURN_MINIMAL).execute()
 
             actor_profile = ensure_profile_row(uid)
             actor_name = profile_display_name(actor_profile)
@@ -3352,7 +3914,7 @@ def search_users():
         following_ids = load_following_ids(uid)
 
         res = (
-            supabase.table("profiles")
+            get_supabase().table("profiles")
             .select("id,username,display_name,bio,avatar_url,account_privacy")
             .limit(100)
             .execute()
@@ -3413,7 +3975,7 @@ def read_profile_by_username(username):
 
     try:
         res = (
-            supabase.table("profiles")
+            get_supabase().table("profiles")
             .select("id,username,display_name,bio,avatar_url,account_privacy,created_at,plan_tier")
             .eq("username", username)
             .limit(1)
@@ -3446,7 +4008,7 @@ def profile_following(profile_id):
 
     try:
         res = (
-            supabase.table("follows")
+            get_supabase().table("follows")
             .select("following_id,created_at")
             .eq("follower_id", profile_id)
             .execute()
@@ -3492,7 +4054,7 @@ def profile_followers(profile_id):
 
     try:
         res = (
-            supabase.table("follows")
+            get_supabase().table("follows")
             .select("follower_id,created_at")
             .eq("following_id", profile_id)
             .execute()
@@ -3537,7 +4099,7 @@ def read_profile(profile_id):
 
     try:
         res = (
-            supabase.table("profiles")
+            get_supabase().table("profiles")
             .select("id,username,display_name,bio,avatar_url,account_privacy,created_at,plan_tier")
             .eq("id", profile_id)
             .limit(1)
@@ -3564,4 +4126,5 @@ def read_profile(profile_id):
 
 
 if __name__ == "__main__":
+    # Local development only; deployments run gunicorn (see gunicorn.conf.py).
     app.run(host="0.0.0.0", port=10000)
@@ -0,0 +1,61 @@
+-- Creates the jobs row and its class_sessions row in one transaction so
+-- /generate needs a single PostgREST round-trip and never leaves an orphan job.
+create or replace function public.create_job_with_session(
+    plan jsonb,
+    user_id uuid,
+    class_mode text,
+    is_public boolean
+)
+returns table (job_id uuid)
+language plpgsql
+as $$
+#variable_conflict use_variable
+declare
+    new_job_id uuid;
+begin
+    insert into public.jobs (status, plan, error, file_url, storage_path)
+    values ('queued', plan, null, null, null)
+    returning id into new_job_id;
+
+    insert into public.class_sessions (
+        job_id,
+        user_id,
+        is_public,
+        class_mode,
+        status,
+        plan,
+        difficulty,
+        length_min,
+        pace,
+        music,
+        file_url,
+        error,
+        started_at,
+        completed_at,
+        storage_path
+    )
+    values (
+        new_job_id,
+        user_id,
+        is_public,
+        class_mode,
+        'queued',
+        plan,
+        plan ->> 'difficulty',
+        (plan ->> 'length_min')::int,
+        plan ->> 'pace',
+        plan ->> 'music',
+        null,
+        null,
+        null,
+        null,
+        null
+    );
+
+    return query select new_job_id;
+end;
+$$;
+
+-- Only the API (service role) may create jobs.
+revoke execute on function public.create_job_with_session(jsonb, uuid, text, boolean) from public, anon, authenticated;
+grant execute on function public.create_job_with_session(jsonb, uuid, text, boolean) to service_role;
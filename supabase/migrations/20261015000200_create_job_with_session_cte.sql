@@ -0,0 +1,52 @@
+-- Same contract as before, but both inserts now run as one writable-CTE
+-- statement instead of two statements inside a PL/pgSQL block.
+create or replace function public.create_job_with_session(
+    plan jsonb,
+    user_id uuid,
+    class_mode text,
+    is_public boolean
+)
+returns table (job_id uuid)
+language sql
+as $$
+    with new_job as (
+        insert into public.jobs (status, plan, error, file_url, storage_path)
+        values ('queued', create_job_with_session.plan, null, null, null)
+        returning id
+    )
+    insert into public.class_sessions (
+        job_id,
+        user_id,
+        is_public,
+        class_mode,
+        status,
+        plan,
+        difficulty,
+        length_min,
+        pace,
+        music,
+        file_url,
+        error,
+        started_at,
+        completed_at,
+        storage_path
+    )
+    select
+        new_job.id,
+        create_job_with_session.user_id,
+        create_job_with_session.is_public,
+        create_job_with_session.class_mode,
+        'queued',
+        create_job_with_session.plan,
+        create_job_with_session.plan ->> 'difficulty',
+        (create_job_with_session.plan ->> 'length_min')::int,
+        create_job_with_session.plan ->> 'pace',
+        create_job_with_session.plan ->> 'music',
+        null,
+        null,
+        null,
+        null,
+        null
+    from new_job
+    returning class_sessions.job_id;
+$$;
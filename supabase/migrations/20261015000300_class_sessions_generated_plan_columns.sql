@@ -0,0 +1,57 @@
+-- class_sessions.difficulty/length_min/pace/music are copies of plan fields.
+-- Make Postgres derive them from plan so writers only send plan and the two can't drift.
+alter table public.class_sessions
+    drop column difficulty,
+    drop column length_min,
+    drop column pace,
+    drop column music;
+
+alter table public.class_sessions
+    add column difficulty text generated always as (plan ->> 'difficulty') stored,
+    add column length_min int generated always as ((plan ->> 'length_min')::int) stored,
+    add column pace text generated always as (plan ->> 'pace') stored,
+    add column music text generated always as (plan ->> 'music') stored;
+
+-- Generated columns can't be written, so the create RPC stops sending them.
+create or replace function public.create_job_with_session(
+    plan jsonb,
+    user_id uuid,
+    class_mode text,
+    is_public boolean
+)
+returns table (job_id uuid)
+language sql
+as $$
+    with new_job as (
+        insert into public.jobs (status, plan, error, file_url, storage_path)
+        values ('queued', create_job_with_session.plan, null, null, null)
+        returning id
+    )
+    insert into public.class_sessions (
+        job_id,
+        user_id,
+        is_public,
+        class_mode,
+        status,
+        plan,
+        file_url,
+        error,
+        started_at,
+        completed_at,
+        storage_path
+    )
+    select
+        new_job.id,
+        create_job_with_session.user_id,
+        create_job_with_session.is_public,
+        create_job_with_session.class_mode,
+        'queued',
+        create_job_with_session.plan,
+        null,
+        null,
+        null,
+        null,
+        null
+    from new_job
+    returning class_sessions.job_id;
+$$;